@@ -2,11 +2,25 @@ import sqlite3
 
 
 class DBHandler:
-    def __init__(self, db_path):
+    def __init__(self, db_path, fast_write=False):
         self.__db = db_path
         self.__cnx = sqlite3.connect(self.__db) if db_path else None
+        if fast_write:
+            self.enable_fast_write()
         self.prepare()
 
+    def enable_fast_write(self):
+        """
+        Trade durability for write speed: commits no longer wait for the data to reach the disk
+        and the journal is kept in memory. A crash of the host during a test session may then
+        corrupt or lose the last metrics written, which is acceptable for monitoring data.
+        """
+        cursor = self.__cnx.cursor()
+        cursor.execute("PRAGMA synchronous = OFF")
+        cursor.execute("PRAGMA journal_mode = MEMORY")
+        cursor.execute("PRAGMA temp_store = MEMORY")
+        cursor.execute("PRAGMA cache_size = -65536")
+
     def query(self, what, bind_to, many=False):
         cursor = self.__cnx.cursor()
         cursor.execute(what, bind_to)
@@ -19,51 +33,22 @@ class DBHandler:
                 (h, run_date, scm_id, description),
             )
 
-    def insert_metric(
-        self,
-        session_id,
-        env_id,
-        item_start_date,
-        item,
-        item_path,
-        item_variant,
-        item_loc,
-        kind,
-        component,
-        total_time,
-        user_time,
-        kernel_time,
-        cpu_usage,
-        mem_usage,
-    ):
+    def insert_metrics(self, metrics):
+        """Insert several metrics rows at once, within a single transaction."""
         with self.__cnx:
-            self.__cnx.execute(
+            self.__cnx.executemany(
                 "insert into TEST_METRICS(SESSION_H,ENV_H,ITEM_START_TIME,ITEM,"
                 "ITEM_PATH,ITEM_VARIANT,ITEM_FS_LOC,KIND,COMPONENT,TOTAL_TIME,"
                 "USER_TIME,KERNEL_TIME,CPU_USAGE,MEM_USAGE) "
                 "values (?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
-                (
-                    session_id,
-                    env_id,
-                    item_start_date,
-                    item,
-                    item_path,
-                    item_variant,
-                    item_loc,
-                    kind,
-                    component,
-                    total_time,
-                    user_time,
-                    kernel_time,
-                    cpu_usage,
-                    mem_usage,
-                ),
+                metrics,
             )
 
-    def insert_execution_context(self, exc_context):
+    def upsert_execution_context(self, exc_context):
+        """Insert the execution context unless it is already known and return its ENV_H."""
         with self.__cnx:
             self.__cnx.execute(
-                "insert into EXECUTION_CONTEXTS(CPU_COUNT,CPU_FREQUENCY_MHZ,CPU_TYPE,CPU_VENDOR,"
+                "insert or ignore into EXECUTION_CONTEXTS(CPU_COUNT,CPU_FREQUENCY_MHZ,CPU_TYPE,CPU_VENDOR,"
                 "RAM_TOTAL_MB,MACHINE_NODE,MACHINE_TYPE,MACHINE_ARCH,SYSTEM_INFO,"
                 "PYTHON_INFO,ENV_H) values (?,?,?,?,?,?,?,?,?,?,?)",
                 (
@@ -80,6 +65,7 @@ class DBHandler:
                     exc_context.compute_hash(),
                 ),
             )
+        return exc_context.compute_hash()
 
     def prepare(self):
         cursor = self.__cnx.cursor()
@@ -4,7 +4,6 @@ import sys
 import time
 import warnings
 
-import memory_profiler
 import pytest
 
 from pytest_monitor.session import PyTestMonitorSession
@@ -204,22 +203,21 @@ def pytest_runtest_call(item):
     if not item.session.config.option.mtr_disable_gc:
         gc.collect()
 
+    # Memory is only reported for functions: don't measure it if they are not monitored.
+    monitor = item.session.pytest_monitor
+    measure_memory = monitor.is_monitored("function")
+
     # Measure memory before
-    mem_before = memory_profiler.memory_usage(-1, interval=0.1, max_usage=True)
+    mem_before = monitor.process.memory_info().rss if measure_memory else 0
 
     # Let the actual test run
     yield
 
     # Measure memory after
-    mem_after = memory_profiler.memory_usage(-1, interval=0.1, max_usage=True)
+    mem_after = monitor.process.memory_info().rss if measure_memory else 0
 
     # Use the max of before/after as the memory usage
-    if isinstance(mem_before, (int, float)):
-        memuse = max(mem_before, mem_after)
-    elif isinstance(mem_before, list):
-        memuse = max(mem_before[0], mem_after[0] if isinstance(mem_after, list) else mem_after)
-    else:
-        memuse = mem_after
+    memuse = max(mem_before, mem_after) / 1024**2
 
     setattr(item, "mem_usage", memuse)
     setattr(item, "monitor_results", True)
@@ -253,15 +251,22 @@ def pytest_sessionstart(session):
         else session.config.option.mtr_db_out
     )
     remote = None if session.config.option.mtr_none else session.config.option.mtr_remote
-    session.pytest_monitor = PyTestMonitorSession(
-        db=db, remote=remote, component=component, scope=session.config.option.mtr_scope
-    )
+    scope = [kind.strip() for kind in session.config.option.mtr_scope.split(",")]
+    session.pytest_monitor = PyTestMonitorSession(db=db, remote=remote, component=component, scope=scope)
     global PYTEST_MONITORING_ENABLED
     PYTEST_MONITORING_ENABLED = not session.config.option.mtr_none
     session.pytest_monitor.compute_info(session.config.option.mtr_description, session.config.option.mtr_tags)
     yield
 
 
+def pytest_sessionfinish(session):
+    """
+    Flush metrics that have not been written or sent yet.
+    """
+    if hasattr(session, "pytest_monitor"):
+        session.pytest_monitor.close()
+
+
 @pytest.fixture(autouse=True, scope="module")
 def _prf_module_tracer(request):
     if not PYTEST_MONITORING_ENABLED:
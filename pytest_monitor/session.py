@@ -1,15 +1,25 @@
 import datetime
+import functools
 import hashlib
 import json
+import math
 import os
+import queue
 import sys
+import threading
+import time
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 from http import HTTPStatus
 
-import memory_profiler
 import psutil
 import requests
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 from pytest_monitor.handler import DBHandler
 from pytest_monitor.sys_utils import (
     ExecutionContext,
@@ -17,26 +27,90 @@ from pytest_monitor.sys_utils import (
     determine_scm_revision,
 )
 
+# Number of buffered metrics rows after which they are written to the local database.
+METRIC_BUFFER_SIZE = 1000
+# Number of buffered metrics after which they are sent to the remote server.
+REMOTE_METRIC_BUFFER_SIZE = 100
+# Number of buffered system memory snapshots after which they are sent to the remote server.
+SYSMEM_BUFFER_SIZE = 64
+# Timeouts (in seconds) of requests sent to the remote server.
+REMOTE_QUERY_TIMEOUT = 5
+REMOTE_INSERT_TIMEOUT = 30
+# pytest joins the ids of the parameters of an item with a dash. We store them comma separated.
+PYTEST_PARAM_ID_SEPARATOR = "-"
+MONITOR_PARAM_ID_SEPARATOR = ", "
+
+
+@functools.lru_cache(maxsize=1024)
+def _isoformat(timestamp):
+    """Format a timestamp as a local ISO 8601 date, without building a datetime object."""
+    # Round the fractional part only, as datetime.fromtimestamp() does.
+    frac, sec = math.modf(timestamp)
+    sec, usec = int(sec), round(frac * 1e6)
+    if usec >= 1_000_000:
+        sec, usec = sec + 1, usec - 1_000_000
+    elif usec < 0:
+        sec, usec = sec - 1, usec + 1_000_000
+    return f"{time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(sec))}.{usec:06d}"
+
+
+@functools.lru_cache(maxsize=256)
+def _final_component(template, user_component):
+    """Build the component of a metric from the session template and the component set by the test."""
+    component = template.format(user_component=user_component)
+    return component[:-1] if component.endswith(".") else component
+
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+def _json_dumps(obj):
+    """Serialize payloads sent to the remote server, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode()
+
 
-def _log(msg):
-    """Log to stdout for debugging in CI environments."""
-    print(f"[pytest-monitor] {msg}", file=sys.stdout, flush=True)
+_DEBUG = os.environ.get("PYTEST_MONITOR_DEBUG") == "1"
+
+if _DEBUG:
+
+    def _log(msg, *args):
+        """Log to stdout for debugging in CI environments. msg is %-formatted with args."""
+        print(f"[pytest-monitor] {msg % args if args else msg}", file=sys.stdout)
+
+else:
+
+    def _log(msg, *args):
+        """Debug logs are disabled: set PYTEST_MONITOR_DEBUG=1 to enable them. msg is never formatted."""
 
 
 class PyTestMonitorSession:
+    _MB = 1.0 / (1024 * 1024)  # bytes to MiB, exact as a power of two
+
     def __init__(self, db=None, remote=None, component="", scope=None, tracing=True):
         self.__db = None
         if db:
-            self.__db = DBHandler(db)
+            self.__db = DBHandler(db, fast_write=True)
         self.__monitor_enabled = tracing
         self.__remote = remote
         self.__component = component
         self.__session = ""
-        self.__scope = scope or []
+        self.__scope = frozenset(scope or ())
         self.__eid = (None, None)
         self.__mem_usage_base = None
         self.__process = psutil.Process(os.getpid())
         self.__test_order = 0  # Counter for test execution order
+        self.__metric_buffer = []
+        self.__remote_metric_buffer = []
+        self.__sysmem_buffer = []
+        self.__http = requests.Session()
+        self.__upload_q = queue.Queue()
+        self.__upload_error = None
+        self.__uploader = None
+        if remote:
+            self.__uploader = threading.Thread(target=self._uploader, name="pytest-monitor-uploader", daemon=True)
+            self.__uploader.start()
 
     @property
     def monitoring_enabled(self):
@@ -62,38 +136,40 @@ class PyTestMonitorSession:
     def test_order(self):
         return self.__test_order
 
+    def is_monitored(self, kind):
+        return kind in self.__scope
+
     def increment_test_order(self):
         self.__test_order += 1
         return self.__test_order
 
-    def get_env_id(self, env):
-        db, remote = None, None
-        if self.__db:
-            row = self.__db.query("SELECT ENV_H FROM EXECUTION_CONTEXTS WHERE ENV_H= ?", (env.compute_hash(),))
-            db = row[0] if row else None
+    def _get_remote_env_id(self, env):
+        remote = None
         if self.__remote:
             url = f"{self.__remote}/contexts/{env.compute_hash()}"
-            _log(f"GET {url}")
-            r = requests.get(url)
-            _log(f"GET response: {r.status_code}")
-            remote = None
+            _log("GET %s", url)
+            try:
+                r = self.__http.get(url, timeout=REMOTE_QUERY_TIMEOUT)
+            except requests.RequestException as e:
+                warnings.warn(f"Cannot query execution context from remote server ({e})! Deactivating...")
+                self.__remote = ""
+                return None
+            _log("GET response: %s", r.status_code)
             if r.status_code == HTTPStatus.OK:
                 remote = json.loads(r.text)
-                _log(f"GET response body: {remote}")
+                _log("GET response body: %s", remote)
                 if remote["contexts"]:
                     remote = remote["contexts"][0]["h"]
                 else:
                     remote = None
-        return db, remote
+        return remote
 
     def compute_info(self, description, tags):
         run_date = datetime.datetime.now().isoformat()
         scm = determine_scm_revision()
-        h = hashlib.md5()
-        h.update(scm.encode())
-        h.update(run_date.encode())
-        h.update(description.encode())
-        self.__session = h.hexdigest()
+        # Not used for security: blake2b is faster than md5 and keeps a 32 characters identifier.
+        session_key = b"|".join((scm.encode(), run_date.encode(), description.encode()))
+        self.__session = hashlib.blake2b(session_key, digest_size=16).hexdigest()
         # From description + tags to JSON format
         d = collect_ci_info()
         if description:
@@ -106,58 +182,72 @@ class PyTestMonitorSession:
                 for sub_tag in tag:
                     _tag_info = sub_tag.split("=", 1)
                     d[_tag_info[0]] = _tag_info[1]
-        description = json.dumps(d)
         # Now get memory usage base and create the database
         self.prepare()
         self.set_environment_info(ExecutionContext())
         if self.__db:
-            self.__db.insert_session(self.__session, run_date, scm, description)
+            self.__db.insert_session(self.__session, run_date, scm, json.dumps(d))
         if self.__remote:
             url = f"{self.__remote}/sessions/"
             payload = {
                 "session_h": self.__session,
                 "run_date": run_date,
                 "scm_ref": scm,
-                "description": json.loads(description),
+                "description": d,
             }
-            _log(f"POST {url}")
-            _log(f"POST payload: {payload}")
-            r = requests.post(url, json=payload)
-            _log(f"POST response: {r.status_code} - {r.text[:200] if r.text else 'empty'}")
+            _log("POST %s", url)
+            _log("POST payload: %s", payload)
+            try:
+                r = self.__http.post(
+                    url, data=_json_dumps(payload), headers=JSON_HEADERS, timeout=REMOTE_INSERT_TIMEOUT
+                )
+            except requests.RequestException as e:
+                self.__remote = ""
+                warnings.warn(f"Cannot insert session in remote monitor server ({e})! Deactivating...")
+                return
+            _log("POST response: %s - %.200s", r.status_code, r.text or "empty")
             if r.status_code != HTTPStatus.CREATED:
                 self.__remote = ""
                 msg = f"Cannot insert session in remote monitor server ({r.status_code})! Deactivating...')"
                 warnings.warn(msg)
 
     def set_environment_info(self, env):
-        self.__eid = self.get_env_id(env)
-        db_id, remote_id = self.__eid
-        _log(f"set_environment_info: db_id={db_id}, remote_id={remote_id}")
-        if self.__db and db_id is None:
-            self.__db.insert_execution_context(env)
-            db_id = self.__db.query("select ENV_H from EXECUTION_CONTEXTS where ENV_H = ?", (env.compute_hash(),))[0]
+        if self.__remote:
+            # Query the remote server while the local database is being updated.
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                remote_future = executor.submit(self._get_remote_env_id, env)
+                db_id = self.__db.upsert_execution_context(env) if self.__db else None
+                remote_id = remote_future.result()
+        else:
+            db_id = self.__db.upsert_execution_context(env) if self.__db else None
+            remote_id = None
+        _log("set_environment_info: db_id=%s, remote_id=%s", db_id, remote_id)
         if self.__remote and remote_id is None:
             url = f"{self.__remote}/contexts/"
             payload = env.to_dict()
-            _log(f"POST {url}")
-            _log(f"POST payload: {payload}")
-            r = requests.post(url, json=payload)
-            _log(f"POST response: {r.status_code} - {r.text[:500] if r.text else 'empty'}")
-            if r.status_code != HTTPStatus.CREATED:
-                warnings.warn(f"Cannot insert execution context in remote server (rc={r.status_code}! Deactivating...")
+            _log("POST %s", url)
+            _log("POST payload: %s", payload)
+            try:
+                r = self.__http.post(
+                    url, data=_json_dumps(payload), headers=JSON_HEADERS, timeout=REMOTE_INSERT_TIMEOUT
+                )
+            except requests.RequestException as e:
+                warnings.warn(f"Cannot insert execution context in remote server ({e})! Deactivating...")
                 self.__remote = ""
             else:
-                remote_id = json.loads(r.text)["h"]
-                _log(f"Got remote context id: {remote_id}")
+                _log("POST response: %s - %.500s", r.status_code, r.text or "empty")
+                if r.status_code != HTTPStatus.CREATED:
+                    msg = f"Cannot insert execution context in remote server (rc={r.status_code}! Deactivating..."
+                    warnings.warn(msg)
+                    self.__remote = ""
+                else:
+                    remote_id = json.loads(r.text)["h"]
+                    _log("Got remote context id: %s", remote_id)
         self.__eid = db_id, remote_id
-        _log(f"Final env IDs: db={db_id}, remote={remote_id}")
+        _log("Final env IDs: db=%s, remote=%s", db_id, remote_id)
 
     def prepare(self):
-        def dummy():
-            return True
-
-        memuse = memory_profiler.memory_usage((dummy,), max_iterations=1, max_usage=True)
-        self.__mem_usage_base = memuse[0] if type(memuse) is list else memuse
+        self.__mem_usage_base = self.__process.memory_info().rss * self._MB
 
     def add_test_info(
         self,
@@ -174,65 +264,126 @@ class PyTestMonitorSession:
         mem_usage,
     ):
         if kind not in self.__scope:
-            _log(f"METRIC SKIPPED (kind={kind} not in scope={self.__scope}): {item}")
+            _log("METRIC SKIPPED (kind=%s not in scope=%s): %s", kind, self.__scope, item)
             return
         mem_usage = float(mem_usage) - self.__mem_usage_base
         cpu_usage = (user_time + kernel_time) / total_time
-        item_start_time = datetime.datetime.fromtimestamp(item_start_time).isoformat()
-        final_component = self.__component.format(user_component=component)
-        if final_component.endswith("."):
-            final_component = final_component[:-1]
-        item_variant = item_variant.replace("-", ", ")  # No choice
+        item_start_time = _isoformat(item_start_time)
+        final_component = _final_component(self.__component, component)
+        item_variant = item_variant.replace(PYTEST_PARAM_ID_SEPARATOR, MONITOR_PARAM_ID_SEPARATOR)
+        # The module tracer slices a new item path on each call: share a single copy across buffered metrics.
+        item_path = sys.intern(item_path)
         if self.__db and self.db_env_id is not None:
-            self.__db.insert_metric(
-                self.__session,
-                self.db_env_id,
-                item_start_time,
-                item,
-                item_path,
-                item_variant,
-                item_loc,
-                kind,
-                final_component,
-                total_time,
-                user_time,
-                kernel_time,
-                cpu_usage,
-                mem_usage,
+            self.__metric_buffer.append(
+                (
+                    self.__session,
+                    self.db_env_id,
+                    item_start_time,
+                    item,
+                    item_path,
+                    item_variant,
+                    item_loc,
+                    kind,
+                    final_component,
+                    total_time,
+                    user_time,
+                    kernel_time,
+                    cpu_usage,
+                    mem_usage,
+                )
             )
+            if len(self.__metric_buffer) >= METRIC_BUFFER_SIZE:
+                self.flush_metrics()
         if self.__remote and self.remote_env_id is not None:
-            url = f"{self.__remote}/metrics/"
-            payload = {
-                "session_h": self.__session,
-                "context_h": self.remote_env_id,
-                "item_start_time": item_start_time,
-                "item_path": item_path,
-                "item": item,
-                "item_variant": item_variant,
-                "item_fs_loc": item_loc,
-                "kind": kind,
-                "component": final_component,
-                "total_time": total_time,
-                "user_time": user_time,
-                "kernel_time": kernel_time,
-                "cpu_usage": cpu_usage,
-                "mem_usage": mem_usage,
-            }
-            _log(f"POST {url} - {item} (mem={mem_usage:.2f}MB)")
-            r = requests.post(url, json=payload)
+            self.__remote_metric_buffer.append(
+                {
+                    "session_h": self.__session,
+                    "context_h": self.remote_env_id,
+                    "item_start_time": item_start_time,
+                    "item_path": item_path,
+                    "item": item,
+                    "item_variant": item_variant,
+                    "item_fs_loc": item_loc,
+                    "kind": kind,
+                    "component": final_component,
+                    "total_time": total_time,
+                    "user_time": user_time,
+                    "kernel_time": kernel_time,
+                    "cpu_usage": cpu_usage,
+                    "mem_usage": mem_usage,
+                }
+            )
+            _log("METRIC BUFFERED: %s (mem=%.2fMB)", item, mem_usage)
+            if len(self.__remote_metric_buffer) >= REMOTE_METRIC_BUFFER_SIZE:
+                self._flush_remote_metrics()
+        elif self.__remote and self.remote_env_id is None:
+            _log("METRIC SKIPPED (no remote_env_id): %s", item)
+
+    def flush_metrics(self):
+        """Write buffered metrics to the local database."""
+        if self.__db and self.__metric_buffer:
+            self.__db.insert_metrics(self.__metric_buffer)
+        self.__metric_buffer.clear()
+
+    def _flush_remote_metrics(self):
+        metrics, self.__remote_metric_buffer = self.__remote_metric_buffer, []
+        if self.__remote and metrics:
+            url = f"{self.__remote}/metrics/bulk"
+            _log("QUEUE %s - %d metrics", url, len(metrics))
+            self.__upload_q.put({"url": url, "payload": {"items": metrics}})
+
+    def _uploader(self):
+        """
+        Send queued payloads to the remote server, off the test execution path.
+        Each item is a dictionary holding the target url, the payload and whether
+        the remote server must be disabled upon failure (mandatory, default True).
+        Once the remote server is disabled, remaining items are dropped.
+        A None item stops the uploader.
+        """
+        while True:
+            item = self.__upload_q.get()
+            if item is None:
+                return
+            if not self.__remote:
+                continue
+            url, mandatory = item["url"], item.get("mandatory", True)
+            try:
+                r = self.__http.post(
+                    url, data=_json_dumps(item["payload"]), headers=JSON_HEADERS, timeout=REMOTE_INSERT_TIMEOUT
+                )
+            except Exception as e:
+                _log("POST %s ERROR: %s", url, e)
+                if mandatory:
+                    self.__remote = ""
+                    self.__upload_error = f"Cannot reach remote monitor server ({e})! Deactivating..."
+                continue
             if r.status_code != HTTPStatus.CREATED:
-                _log(f"METRIC FAILED: {r.status_code} - {r.text[:200] if r.text else 'empty'}")
-                self.__remote = ""
-                msg = f"Cannot insert values in remote monitor server ({r.status_code})! Deactivating...')"
-                warnings.warn(msg)
+                _log("POST %s FAILED: %s - %.200s", url, r.status_code, r.text or "empty")
+                if mandatory:
+                    self.__remote = ""
+                    msg = f"Cannot insert values in remote monitor server ({r.status_code})! Deactivating...')"
+                    self.__upload_error = msg
             else:
-                _log(f"METRIC OK: {item}")
-        elif self.__remote and self.remote_env_id is None:
-            _log(f"METRIC SKIPPED (no remote_env_id): {item}")
+                _log("POST %s OK", url)
+
+    def close(self):
+        """Send all pending metrics and release the resources held by the session."""
+        self.flush_metrics()
+        self._flush_remote_metrics()
+        self._flush_sysmem()
+        if self.__uploader:
+            self.__upload_q.put(None)
+            self.__uploader.join()
+            self.__uploader = None
+        # Warn from the calling thread, not from the uploader, so that pytest reports it with the session.
+        if self.__upload_error:
+            warnings.warn(self.__upload_error)
+            self.__upload_error = None
+        self.__http.close()
 
     def add_system_memory_snapshot(self, item_path, item):
         """
-        Capture and send system-wide memory snapshot after a test.
+        Capture system-wide memory snapshot after a test. Snapshots are sent by batch.
         This helps identify memory leaks outside of individual test functions.
         """
         if not self.__remote:
@@ -247,28 +398,34 @@ class PyTestMonitorSession:
 
         recorded_at = datetime.datetime.now().isoformat()
 
+        cached = getattr(vm, "cached", None)
+        buffers = getattr(vm, "buffers", None)
+        mb = self._MB
         payload = {
             "session_h": self.__session,
             "test_order": test_order,
             "item_path": item_path,
             "item": item,
-            "total_memory_mb": vm.total / (1024 ** 2),
-            "available_memory_mb": vm.available / (1024 ** 2),
-            "used_memory_mb": vm.used / (1024 ** 2),
+            "total_memory_mb": vm.total * mb,
+            "available_memory_mb": vm.available * mb,
+            "used_memory_mb": vm.used * mb,
             "memory_percent": vm.percent,
-            "process_rss_mb": proc_mem.rss / (1024 ** 2),
-            "process_vms_mb": proc_mem.vms / (1024 ** 2),
-            "cached_mb": getattr(vm, 'cached', 0) / (1024 ** 2) if hasattr(vm, 'cached') else None,
-            "buffers_mb": getattr(vm, 'buffers', 0) / (1024 ** 2) if hasattr(vm, 'buffers') else None,
-            "swap_used_mb": swap.used / (1024 ** 2),
+            "process_rss_mb": proc_mem.rss * mb,
+            "process_vms_mb": proc_mem.vms * mb,
+            "cached_mb": cached * mb if cached is not None else None,
+            "buffers_mb": buffers * mb if buffers is not None else None,
+            "swap_used_mb": swap.used * mb,
             "recorded_at": recorded_at,
         }
 
-        url = f"{self.__remote}/system-memory/"
-        try:
-            r = requests.post(url, json=payload)
-            if r.status_code != HTTPStatus.CREATED:
-                _log(f"SYSMEM FAILED: {r.status_code} - {r.text[:200] if r.text else 'empty'}")
+        self.__sysmem_buffer.append(payload)
+        if len(self.__sysmem_buffer) >= SYSMEM_BUFFER_SIZE:
+            self._flush_sysmem()
+
+    def _flush_sysmem(self):
+        snapshots, self.__sysmem_buffer = self.__sysmem_buffer, []
+        if self.__remote and snapshots:
+            url = f"{self.__remote}/system-memory/bulk"
+            _log("QUEUE %s - %d snapshots", url, len(snapshots))
             # Don't disable remote on system memory failures - it's optional
-        except Exception as e:
-            _log(f"SYSMEM ERROR: {e}")
+            self.__upload_q.put({"url": url, "payload": {"items": snapshots}, "mandatory": False})
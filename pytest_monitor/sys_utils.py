@@ -103,6 +103,7 @@ class ExecutionContext:
         self.__arch = platform.architecture()[0]
         self.__system = f"{platform.system()} - {platform.release()}"
         self.__py_ver = sys.version
+        self.__hash = None
 
     def _read_cpu_freq_from_env(self):
         try:
@@ -167,7 +168,14 @@ class ExecutionContext:
         return self.__py_ver
 
     def compute_hash(self):
-        hr = hashlib.md5()
+        # The context does not change once collected: compute its hash only once.
+        if self.__hash is None:
+            self.__hash = self._compute_hash()
+        return self.__hash
+
+    def _compute_hash(self):
+        # The hash only deduplicates contexts, so any fast digest of the md5 size does.
+        hr = hashlib.blake2b(digest_size=16)
         hr.update(str(self.__cpu_count).encode())
         hr.update(str(self.__cpu_freq_base).encode())
         hr.update(str(self.__proc_typ).encode())
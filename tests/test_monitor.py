@@ -406,3 +406,56 @@ def test_monitor_with_doctest(testdir):
     # make sure that that we get a '0' exit code for the testsuite
     result.assert_outcomes(passed=1)
     assert not pymon_path.exists()
+
+
+def test_monitor_flush_metrics_by_batch(testdir, monkeypatch):
+    """Make sure that pytest-monitor does not lose metrics when flushing them by batch."""
+    monkeypatch.setattr("pytest_monitor.session.METRIC_BUFFER_SIZE", 2)
+    # create a temporary pytest test module
+    testdir.makepyfile(
+        """
+    import pytest
+
+
+    @pytest.mark.parametrize("i", range(5))
+    def test_ok(i):
+        assert i < 5
+
+"""
+    )
+
+    # run pytest with the following cmd args
+    result = testdir.runpytest("-v")
+
+    # make sure that that we get a '0' exit code for the testsuite
+    result.assert_outcomes(passed=5)
+
+    pymon_path = pathlib.Path(str(testdir)) / ".pymon"
+    db = sqlite3.connect(str(pymon_path))
+    cursor = db.cursor()
+    cursor.execute("SELECT ITEM_VARIANT FROM TEST_METRICS;")
+    assert sorted(row[0] for row in cursor.fetchall()) == [f"test_ok[{i}]" for i in range(5)]
+
+
+def test_monitor_restrict_scope_to_function_and_module(testdir):
+    """Make sure that pytest-monitor monitors every scope given to --restrict-scope-to."""
+    # create a temporary pytest test module
+    testdir.makepyfile(
+        """
+    def test_ok():
+        assert True
+
+"""
+    )
+
+    # run pytest with the following cmd args
+    result = testdir.runpytest("--restrict-scope-to", "function, module", "-v")
+
+    # make sure that that we get a '0' exit code for the testsuite
+    result.assert_outcomes(passed=1)
+
+    pymon_path = pathlib.Path(str(testdir)) / ".pymon"
+    db = sqlite3.connect(str(pymon_path))
+    cursor = db.cursor()
+    cursor.execute("SELECT KIND FROM TEST_METRICS;")
+    assert sorted(row[0] for row in cursor.fetchall()) == ["function", "module"]
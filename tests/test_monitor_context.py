@@ -141,3 +141,24 @@ def test_when_cpu_freq_cannot_fetch_frequency(cpu_freq_mock, testdir):
     nb_metrics, cpu_freq = get_nb_metrics_with_cpu_freq(pathlib.Path(str(testdir)))
 
     assert (nb_metrics, cpu_freq) == (1, 0)
+
+
+def test_execution_context_stored_once(testdir):
+    """Make sure that pytest-monitor does not duplicate a known execution context"""
+    # create a temporary pytest test module
+    testdir.makepyfile(TEST_CONTENT)
+
+    # run pytest twice in the same environment
+    testdir.runpytest("-vv").assert_outcomes(passed=1)
+    result = testdir.runpytest("-vv")
+
+    # make sure that we get a '0' exit code for the test suite
+    result.assert_outcomes(passed=1)
+
+    db = sqlite3.connect((pathlib.Path(str(testdir)) / ".pymon").as_posix())
+    cursor = db.cursor()
+    cursor.execute("SELECT ENV_H FROM EXECUTION_CONTEXTS;")
+    contexts = cursor.fetchall()
+    assert len(contexts) == 1
+    cursor.execute("SELECT DISTINCT ENV_H FROM TEST_METRICS;")
+    assert cursor.fetchall() == contexts
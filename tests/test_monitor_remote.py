@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+import json
+import pathlib
+import sqlite3
+from http import HTTPStatus
+
+import mock
+import requests
+
+HTTP_SESSION_PATH = "pytest_monitor.session.requests.Session"
+
+TEST_CONTENT = """
+import pytest
+
+
+@pytest.mark.parametrize("i", range(3))
+def test_ok(i):
+    assert i < 3
+"""
+
+
+def _response(status_code, body=None):
+    response = mock.Mock()
+    response.status_code = status_code
+    response.text = json.dumps(body) if body is not None else ""
+    return response
+
+
+def _remote_session():
+    http = mock.Mock()
+    http.get.return_value = _response(HTTPStatus.NO_CONTENT)
+    http.post.return_value = _response(HTTPStatus.CREATED, {"h": "remote-context"})
+    return http
+
+
+def _posted(http, route):
+    return [c for c in http.post.call_args_list if c.args[0].endswith(route)]
+
+
+def _posted_items(posted):
+    return json.loads(posted.kwargs["data"])["items"]
+
+
+def test_monitor_remote_metrics_sent_by_batch(testdir):
+    """Make sure that pytest-monitor sends all metrics of a session in a single bulk request."""
+    # create a temporary pytest test module
+    testdir.makepyfile(TEST_CONTENT)
+
+    http = _remote_session()
+    with mock.patch(HTTP_SESSION_PATH, return_value=http):
+        # run pytest with the following cmd args
+        result = testdir.runpytest("--no-db", "--remote-server", "http://monitor", "-v")
+
+    # make sure that that we get a '0' exit code for the testsuite
+    result.assert_outcomes(passed=3)
+
+    bulk = _posted(http, "/metrics/bulk")
+    assert len(bulk) == 1
+    items = _posted_items(bulk[0])
+    assert [item["item_variant"] for item in items] == [f"test_ok[{i}]" for i in range(3)]
+    assert {item["context_h"] for item in items} == {"remote-context"}
+    snapshots = _posted(http, "/system-memory/bulk")
+    assert len(snapshots) == 1
+    assert [item["test_order"] for item in _posted_items(snapshots[0])] == [1, 2, 3]
+    http.close.assert_called_once()
+
+
+def test_monitor_remote_unreachable(testdir):
+    """Make sure that pytest-monitor stops using a remote server which does not answer in time."""
+    # create a temporary pytest test module
+    testdir.makepyfile(TEST_CONTENT)
+
+    http = _remote_session()
+    http.get.side_effect = requests.Timeout("timed out")
+    with mock.patch(HTTP_SESSION_PATH, return_value=http):
+        # run pytest with the following cmd args
+        result = testdir.runpytest("--remote-server", "http://monitor", "-v")
+
+    # make sure that that we get a '0' exit code for the testsuite
+    result.assert_outcomes(passed=3)
+
+    http.post.assert_not_called()
+    db = sqlite3.connect(str(pathlib.Path(str(testdir)) / ".pymon"))
+    cursor = db.cursor()
+    cursor.execute("SELECT ITEM FROM TEST_METRICS;")
+    assert len(cursor.fetchall()) == 3
+
+
+def test_monitor_remote_stops_uploading_after_failure(testdir, monkeypatch):
+    """Make sure that pytest-monitor drops pending uploads once the remote server rejected metrics."""
+    monkeypatch.setattr("pytest_monitor.session.REMOTE_METRIC_BUFFER_SIZE", 1)
+    # create a temporary pytest test module
+    testdir.makepyfile(TEST_CONTENT)
+
+    def post(url, **kwargs):
+        if url.endswith("/metrics/bulk"):
+            return _response(HTTPStatus.INTERNAL_SERVER_ERROR)
+        return _response(HTTPStatus.CREATED, {"h": "remote-context"})
+
+    http = _remote_session()
+    http.post.side_effect = post
+    with mock.patch(HTTP_SESSION_PATH, return_value=http):
+        # run pytest with the following cmd args
+        result = testdir.runpytest("--no-db", "--remote-server", "http://monitor", "-v")
+
+    # make sure that that we get a '0' exit code for the testsuite
+    result.assert_outcomes(passed=3)
+
+    assert len(_posted(http, "/metrics/bulk")) == 1
+    assert not _posted(http, "/system-memory/bulk")
+    result.stdout.fnmatch_lines(["*Cannot insert values in remote monitor server (500)*"])
@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+import datetime
+
+import pytest
+
+from pytest_monitor.session import _isoformat
+
+
+@pytest.mark.parametrize("timestamp", [1697045003.2145154, 1700000000.123456, 1700000000.9999996, 1.5, 0.25])
+def test_isoformat_matches_datetime(timestamp):
+    """Make sure that metric start times are formatted like datetime does, microseconds included."""
+    expected = datetime.datetime.fromtimestamp(timestamp)
+    assert _isoformat(timestamp) == expected.isoformat(timespec="microseconds")